@@ -21,6 +21,11 @@ Usage:
 import cv2
 import numpy as np
 import json
+import math
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from typing import List, Dict, Optional, Tuple
 from enum import Enum
@@ -41,6 +46,17 @@ except ImportError:
     YOLO_AVAILABLE = False
     print("Warning: Ultralytics not installed. Advanced ball tracking disabled.")
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    print("Warning: Numba not installed. Trajectory math will run uncompiled.")
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit"""
+        return lambda func: func
+
 
 class ShotType(Enum):
     """Types of shots in pickleball"""
@@ -57,6 +73,49 @@ class ShotType(Enum):
     ERNE = "erne"
 
 
+# Shot types returned by _classify_trajectory, indexed by its result code
+TRAJECTORY_SHOT_TYPES = (
+    ShotType.UNKNOWN,
+    ShotType.DRIVE,
+    ShotType.DINK,
+    ShotType.LOB,
+    ShotType.DROP,
+)
+
+
+@njit(cache=True, fastmath=True)
+def _classify_trajectory(pts: np.ndarray, history_len: int) -> int:
+    """
+    Classify the last few ball positions (an (N, 2) float32 array, oldest
+    first) into an index of TRAJECTORY_SHOT_TYPES.
+    """
+    # Direction and speed of each step
+    steps = pts[1:] - pts[:-1]
+    directions = np.arctan2(steps[:, 1], steps[:, 0])
+    speeds = np.hypot(steps[:, 0], steps[:, 1])
+
+    avg_speed = speeds.mean()
+    direction_change = directions.std()
+
+    # High speed, straight trajectory = drive
+    if avg_speed > 20 and direction_change < 0.3:
+        return 1
+
+    # Low speed, short trajectory = dink
+    if avg_speed < 8 and history_len > 10:
+        return 2
+
+    # Upward trajectory = lob
+    if (directions[-3:] < -0.5).all():
+        return 3
+
+    # Downward with medium speed = drop
+    if avg_speed < 15 and (directions[-3:] > 0.3).all():
+        return 4
+
+    return 0
+
+
 @dataclass
 class DetectedShot:
     """Represents a detected shot in the video"""
@@ -81,6 +140,165 @@ class PlayerMovement:
     velocity: float  # Movement speed
 
 
+# Stable integer codes for ShotType, used by the columnar shot log
+SHOT_TYPE_CODES = tuple(ShotType)
+_SHOT_TYPE_INDEX = {shot_type: code for code, shot_type in enumerate(SHOT_TYPE_CODES)}
+
+
+class _ColumnLog:
+    """
+    Growable structure-of-arrays log: one contiguous NumPy column per field.
+    Subclasses list their fields in COLUMNS as (name, dtype) pairs.
+
+    If path is given, each column is an np.memmap backed by the file
+    "{path}.{column}" instead of living in RAM.
+    """
+
+    COLUMNS: Tuple[Tuple[str, type], ...] = ()
+
+    def __init__(self, capacity: int = 256, path: Optional[str] = None):
+        self._size = 0
+        self._path = path
+        self._columns = {name: self._allocate(name, dtype, capacity) for name, dtype in self.COLUMNS}
+
+    def _allocate(self, name: str, dtype, capacity: int, old: Optional[np.ndarray] = None) -> np.ndarray:
+        """Create a column with room for capacity rows, keeping old's contents"""
+        if self._path is None:
+            column = np.empty(capacity, dtype=dtype)
+            if old is not None:
+                column[:len(old)] = old
+            return column
+
+        # File-backed: size the file, then (re)map it. Growing the file in
+        # place keeps the rows already written.
+        filename = f"{self._path}.{name}"
+        if old is not None:
+            old.flush()
+        with open(filename, 'r+b' if old is not None else 'wb') as f:
+            f.truncate(capacity * np.dtype(dtype).itemsize)
+        return np.memmap(filename, dtype=dtype, mode='r+', shape=(capacity,))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def _row_index(self, i: int) -> int:
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("row index out of range")
+        return i
+
+    def column(self, name: str) -> np.ndarray:
+        """View of one field for all recorded rows"""
+        return self._columns[name][:self._size]
+
+    def _append_row(self, **values):
+        i = self._size
+        if i == len(self._columns[self.COLUMNS[0][0]]):
+            # Double capacity
+            for name, col in self._columns.items():
+                self._columns[name] = self._allocate(name, col.dtype, max(1, 2 * len(col)), col)
+
+        for name, value in values.items():
+            self._columns[name][i] = value
+        self._size = i + 1
+
+
+class ShotLog(_ColumnLog):
+    """Columnar storage for detected shots; rows read back as DetectedShot"""
+
+    COLUMNS = (
+        ('frame_number', np.int32),
+        ('timestamp', np.float64),
+        ('shot_type', np.int8),  # Index into SHOT_TYPE_CODES
+        ('player_id', np.int8),
+        ('ball_speed', np.float64),  # NaN if unknown
+        ('placement_x', np.float64),  # NaN if unknown
+        ('placement_y', np.float64),  # NaN if unknown
+        ('confidence', np.float64),
+    )
+
+    def append(self, frame_number: int, timestamp: float, shot_type: ShotType, player_id: int,
+               ball_speed: Optional[float] = None, placement_x: Optional[float] = None,
+               placement_y: Optional[float] = None, confidence: float = 0.5):
+        """Record a shot (same fields as DetectedShot)"""
+        self._append_row(
+            frame_number=frame_number,
+            timestamp=timestamp,
+            shot_type=_SHOT_TYPE_INDEX[shot_type],
+            player_id=player_id,
+            ball_speed=np.nan if ball_speed is None else ball_speed,
+            placement_x=np.nan if placement_x is None else placement_x,
+            placement_y=np.nan if placement_y is None else placement_y,
+            confidence=confidence
+        )
+
+    def placements(self) -> np.ndarray:
+        """(N, 2) array of known (placement_x, placement_y) pairs"""
+        xs = self.column('placement_x')
+        placed = ~np.isnan(xs)
+        return np.column_stack((xs[placed], self.column('placement_y')[placed]))
+
+    def __getitem__(self, i: int) -> DetectedShot:
+        i = self._row_index(i)
+
+        def optional(name):
+            value = float(self._columns[name][i])
+            return None if np.isnan(value) else value
+
+        return DetectedShot(
+            frame_number=int(self._columns['frame_number'][i]),
+            timestamp=float(self._columns['timestamp'][i]),
+            shot_type=SHOT_TYPE_CODES[self._columns['shot_type'][i]],
+            player_id=int(self._columns['player_id'][i]),
+            ball_speed=optional('ball_speed'),
+            placement_x=optional('placement_x'),
+            placement_y=optional('placement_y'),
+            confidence=float(self._columns['confidence'][i])
+        )
+
+
+class MovementLog(_ColumnLog):
+    """Columnar storage for player movement samples; rows read back as PlayerMovement"""
+
+    COLUMNS = (
+        ('frame_number', np.int32),
+        ('timestamp', np.float64),
+        ('player_id', np.int8),
+        ('position_x', np.float64),
+        ('position_y', np.float64),
+        ('velocity', np.float64),
+    )
+
+    def append(self, frame_number: int, timestamp: float, player_id: int,
+               position_x: float, position_y: float, velocity: float):
+        """Record a movement sample (same fields as PlayerMovement)"""
+        self._append_row(
+            frame_number=frame_number,
+            timestamp=timestamp,
+            player_id=player_id,
+            position_x=position_x,
+            position_y=position_y,
+            velocity=velocity
+        )
+
+    def __getitem__(self, i: int) -> PlayerMovement:
+        i = self._row_index(i)
+
+        return PlayerMovement(
+            frame_number=int(self._columns['frame_number'][i]),
+            timestamp=float(self._columns['timestamp'][i]),
+            player_id=int(self._columns['player_id'][i]),
+            position_x=float(self._columns['position_x'][i]),
+            position_y=float(self._columns['position_y'][i]),
+            velocity=float(self._columns['velocity'][i])
+        )
+
+
 @dataclass
 class AnalysisResults:
     """Complete analysis results from a video"""
@@ -89,11 +307,11 @@ class AnalysisResults:
     fps: float
 
     # Shot data
-    shots: List[DetectedShot]
+    shots: ShotLog
     shot_breakdown: Dict[str, int]
 
     # Movement data
-    movements: List[PlayerMovement]
+    movements: Optional[MovementLog]  # None unless the analyzer keeps them
     court_coverage: float  # 0-100
     avg_recovery_time: float  # seconds
 
@@ -110,18 +328,22 @@ class AnalysisResults:
     def to_avatar_stats(self) -> Dict[str, int]:
         """Convert analysis to 1-99 avatar stats"""
 
+        n_shots = max(len(self.shots), 1)
+        breakdown = self.shot_breakdown
+        placement_accuracy = self.placement_accuracy
+
         # Calculate Power (based on shot speed and overhead frequency)
-        overhead_ratio = self.shot_breakdown.get('overhead', 0) / max(len(self.shots), 1)
-        drive_ratio = self.shot_breakdown.get('drive', 0) / max(len(self.shots), 1)
+        overhead_ratio = breakdown.get('overhead', 0) / n_shots
+        drive_ratio = breakdown.get('drive', 0) / n_shots
         power = min(99, max(1, int(
             50 + (overhead_ratio * 30) + (drive_ratio * 20)
         )))
 
         # Calculate Finesse (based on dinks, drops, and placement)
-        dink_ratio = self.shot_breakdown.get('dink', 0) / max(len(self.shots), 1)
-        drop_ratio = self.shot_breakdown.get('drop', 0) / max(len(self.shots), 1)
+        dink_ratio = breakdown.get('dink', 0) / n_shots
+        drop_ratio = breakdown.get('drop', 0) / n_shots
         finesse = min(99, max(1, int(
-            40 + (dink_ratio * 30) + (drop_ratio * 20) + (self.placement_accuracy * 0.1)
+            40 + (dink_ratio * 30) + (drop_ratio * 20) + (placement_accuracy * 0.1)
         )))
 
         # Calculate Speed (based on court coverage and recovery)
@@ -131,19 +353,22 @@ class AnalysisResults:
         )))
 
         # Calculate Court IQ (based on shot selection variety and winners)
-        shot_variety = len([v for v in self.shot_breakdown.values() if v > 0])
-        winner_ratio = self.winners / max(len(self.shots), 1)
+        shot_variety = sum(1 for v in breakdown.values() if v > 0)
+        winner_ratio = self.winners / n_shots
         court_iq = min(99, max(1, int(
-            40 + (shot_variety * 5) + (winner_ratio * 40) + (self.placement_accuracy * 0.15)
+            40 + (shot_variety * 5) + (winner_ratio * 40) + (placement_accuracy * 0.15)
         )))
 
         # Calculate Consistency (based on unforced errors and rally length)
-        error_ratio = self.unforced_errors / max(len(self.shots), 1)
-        avg_rally = sum(self.rally_lengths) / max(len(self.rally_lengths), 1)
+        error_ratio = self.unforced_errors / n_shots
+        rally_lengths = self.rally_lengths
+        avg_rally = sum(rally_lengths) / max(len(rally_lengths), 1)
         consistency = min(99, max(1, int(
             70 - (error_ratio * 50) + (min(avg_rally, 20) * 1.5)
         )))
 
+        confidence = self.overall_confidence
+
         return {
             'power': power,
             'finesse': finesse,
@@ -151,11 +376,11 @@ class AnalysisResults:
             'court_iq': court_iq,
             'consistency': consistency,
             'confidence': {
-                'power': self.overall_confidence * 0.9,
-                'finesse': self.overall_confidence * 0.95,
-                'speed': self.overall_confidence * 0.85,
-                'court_iq': self.overall_confidence * 0.8,
-                'consistency': self.overall_confidence * 0.9
+                'power': confidence * 0.9,
+                'finesse': confidence * 0.95,
+                'speed': confidence * 0.85,
+                'court_iq': confidence * 0.8,
+                'consistency': confidence * 0.9
             }
         }
 
@@ -165,7 +390,14 @@ class AnalysisResults:
             'video_duration': self.video_duration,
             'total_frames': self.total_frames,
             'fps': self.fps,
-            'shots': [{'frame': s.frame_number, 'type': s.shot_type.value, 'confidence': s.confidence} for s in self.shots],
+            'shots': [
+                {'frame': frame, 'type': SHOT_TYPE_CODES[code].value, 'confidence': confidence}
+                for frame, code, confidence in zip(
+                    self.shots.column('frame_number').tolist(),
+                    self.shots.column('shot_type').tolist(),
+                    self.shots.column('confidence').tolist()
+                )
+            ],
             'shot_breakdown': self.shot_breakdown,
             'court_coverage': self.court_coverage,
             'avg_recovery_time': self.avg_recovery_time,
@@ -179,29 +411,68 @@ class AnalysisResults:
         }
 
 
+def _reuse_buffer(buf: Optional[np.ndarray], shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+    """Return buf if it matches shape/dtype, otherwise allocate a new one"""
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        return np.empty(shape, dtype=dtype)
+    return buf
+
+
 class CourtDetector:
     """Detects and tracks the pickleball court boundaries"""
 
+    # Mean absolute difference (0-255) between 16x9 thumbnails below which
+    # a frame counts as unchanged and Canny/Hough is skipped
+    UNCHANGED_THRESHOLD = 2.0
+
     def __init__(self):
         self.court_corners = None
         self.perspective_matrix = None
 
-    def detect_court(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        # Scratch buffers, reused across frames of the same size
+        self._gray_buf = None
+        self._blur_buf = None
+        self._edges_buf = None
+
+        # Thumbnail of the last frame that went through full detection
+        self._prev_thumb = None
+
+    def detect_court(self, frame: np.ndarray, scale: float = 1.0) -> Optional[np.ndarray]:
         """
         Detect court lines and return corner points.
         Uses edge detection and Hough transform.
+
+        scale is how much frame was downscaled from the source video; line
+        thresholds are tuned at source resolution and corners are returned
+        in source pixels.
         """
+        shape = frame.shape[:2]
+        self._gray_buf = _reuse_buffer(self._gray_buf, shape)
+        self._blur_buf = _reuse_buffer(self._blur_buf, shape)
+        self._edges_buf = _reuse_buffer(self._edges_buf, shape)
+
         # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
+
+        # Skip frames that look the same as the last one we processed
+        thumb = cv2.resize(gray, (16, 9), interpolation=cv2.INTER_AREA).astype(np.int16)
+        if self._prev_thumb is not None and np.abs(thumb - self._prev_thumb).mean() < self.UNCHANGED_THRESHOLD:
+            return self.court_corners
+        self._prev_thumb = thumb
 
         # Apply Gaussian blur
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0, dst=self._blur_buf)
 
         # Edge detection
-        edges = cv2.Canny(blurred, 50, 150)
+        edges = cv2.Canny(blurred, 50, 150, edges=self._edges_buf)
 
         # Find lines using Hough transform
-        lines = cv2.HoughLinesP(edges, 1, np.pi/180, 100, minLineLength=100, maxLineGap=10)
+        lines = cv2.HoughLinesP(
+            edges, 1, np.pi/180,
+            max(1, round(100 * scale)),
+            minLineLength=100 * scale,
+            maxLineGap=10 * scale
+        )
 
         if lines is None:
             return None
@@ -213,6 +484,7 @@ class CourtDetector:
         corners = self._find_corners(court_lines)
 
         if corners is not None and len(corners) == 4:
+            corners = corners / scale
             self.court_corners = corners
             self._calculate_perspective(corners)
 
@@ -275,30 +547,61 @@ class CourtDetector:
 class BallTracker:
     """Tracks the pickleball across frames"""
 
+    HISTORY_SIZE = 30
+
+    # Ball contour area range (px^2) at source resolution
+    MIN_BALL_AREA = 50
+    MAX_BALL_AREA = 5000
+
     def __init__(self):
         self.last_position = None
         self.velocity = (0, 0)
-        self.ball_history = []
+
+        # Ring buffer of recent positions. Each point is written twice
+        # (at i and i + HISTORY_SIZE) so the latest N points are always a
+        # contiguous slice, without copying.
+        self.ball_history = np.empty((2 * self.HISTORY_SIZE, 2), dtype=np.float32)
+        self.history_index = 0
+        self.history_len = 0
 
         # Ball detection parameters
         self.ball_color_lower = np.array([20, 100, 100])  # Yellow-green lower bound
         self.ball_color_upper = np.array([40, 255, 255])  # Yellow-green upper bound
+        self.kernel = np.ones((5, 5), np.uint8)  # At source resolution
+        self._scaled_kernels = {}
 
-    def detect_ball(self, frame: np.ndarray) -> Optional[Tuple[float, float]]:
+        # Scratch buffers, reused across frames of the same size
+        self._hsv_buf = None
+        self._mask_buf = None
+        self._morph_buf = None
+
+        # Run the color mask on the GPU via OpenCV's T-API when available
+        self.use_opencl = cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+
+    def detect_ball(self, frame: np.ndarray, scale: float = 1.0) -> Optional[Tuple[float, float]]:
         """
         Detect ball position in frame using color detection.
         Returns (x, y) position or None if not found.
         """
-        # Convert to HSV
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        position = self.locate_ball(frame, scale)
+        if position:
+            self.update(position)
+        return position
 
-        # Create mask for ball color
-        mask = cv2.inRange(hsv, self.ball_color_lower, self.ball_color_upper)
+    def locate_ball(self, frame: np.ndarray, scale: float = 1.0) -> Optional[Tuple[float, float]]:
+        """
+        Find the ball in a single frame without touching tracking state.
+        Safe to run out of order (e.g. in a worker process).
 
-        # Apply morphological operations
-        kernel = np.ones((5, 5), np.uint8)
-        mask = cv2.erode(mask, kernel, iterations=1)
-        mask = cv2.dilate(mask, kernel, iterations=2)
+        scale is how much frame was downscaled from the source video. The
+        position is returned in source pixels, so trajectory speeds and shot
+        thresholds don't depend on the analysis resolution.
+        """
+        kernel = self._kernel_for(scale)
+        if self.use_opencl:
+            mask = self._color_mask_opencl(frame, kernel)
+        else:
+            mask = self._color_mask(frame, kernel)
 
         # Find contours
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -306,123 +609,174 @@ class BallTracker:
         if not contours:
             return None
 
-        # Find the most circular contour of appropriate size
-        best_match = None
-        best_circularity = 0
-
-        for contour in contours:
-            area = cv2.contourArea(contour)
-
-            # Filter by size (ball should be certain size range)
-            if area < 50 or area > 5000:
-                continue
-
-            # Check circularity
-            perimeter = cv2.arcLength(contour, True)
-            if perimeter == 0:
-                continue
-
-            circularity = 4 * np.pi * area / (perimeter * perimeter)
-
-            if circularity > best_circularity and circularity > 0.5:
-                best_circularity = circularity
-                M = cv2.moments(contour)
-                if M["m00"] != 0:
-                    cx = M["m10"] / M["m00"]
-                    cy = M["m01"] / M["m00"]
-                    best_match = (cx, cy)
-
-        if best_match:
-            # Calculate velocity
-            if self.last_position:
-                self.velocity = (
-                    best_match[0] - self.last_position[0],
-                    best_match[1] - self.last_position[1]
-                )
+        # Filter by size (ball should be certain size range) before doing
+        # any per-contour work on the noise blobs
+        areas = np.fromiter((cv2.contourArea(c) for c in contours), dtype=np.float64, count=len(contours))
+        area_scale = scale * scale
+        candidates = np.flatnonzero(
+            (areas >= self.MIN_BALL_AREA * area_scale) & (areas <= self.MAX_BALL_AREA * area_scale)
+        )
 
-            self.last_position = best_match
-            self.ball_history.append(best_match)
+        if candidates.size == 0:
+            return None
 
-            # Keep history limited
-            if len(self.ball_history) > 30:
-                self.ball_history.pop(0)
+        # Find the most circular remaining contour
+        perimeters = np.array([cv2.arcLength(contours[i], True) for i in candidates])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            circularity = np.where(
+                perimeters > 0,
+                4 * np.pi * areas[candidates] / (perimeters * perimeters),
+                0
+            )
+
+        best = int(np.argmax(circularity))
+        if circularity[best] <= 0.5:
+            return None
+
+        # Area filter guarantees m00 > 0
+        M = cv2.moments(contours[candidates[best]])
+        best_match = (M["m10"] / M["m00"] / scale, M["m01"] / M["m00"] / scale)
 
         return best_match
 
-    def get_speed(self) -> float:
-        """Get ball speed in pixels per frame"""
-        return np.sqrt(self.velocity[0]**2 + self.velocity[1]**2)
+    def _kernel_for(self, scale: float) -> np.ndarray:
+        """Morphology kernel shrunk to match a downscaled frame (odd size, at least 1)"""
+        kernel = self._scaled_kernels.get(scale)
+        if kernel is None:
+            size = self.kernel.shape[0] * scale
+            size = max(1, 2 * round((size - 1) / 2) + 1)
+            kernel = self._scaled_kernels[scale] = np.ones((size, size), np.uint8)
+        return kernel
+
+    def _color_mask(self, frame: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        """Binary mask of ball-colored pixels, computed on the CPU"""
+        self._hsv_buf = _reuse_buffer(self._hsv_buf, frame.shape)
+        self._mask_buf = _reuse_buffer(self._mask_buf, frame.shape[:2])
+        self._morph_buf = _reuse_buffer(self._morph_buf, frame.shape[:2])
 
-    def detect_shot(self) -> Optional[ShotType]:
-        """
-        Analyze ball trajectory to detect shot type.
-        Returns shot type if a shot was just made, None otherwise.
-        """
-        if len(self.ball_history) < 5:
-            return None
+        # Convert to HSV
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self._hsv_buf)
 
-        # Analyze trajectory
-        recent = self.ball_history[-5:]
+        # Create mask for ball color. A single SIMD inRange pass measured
+        # ~5x faster than split + per-channel cv2.LUT + bitwise_and here.
+        mask = cv2.inRange(hsv, self.ball_color_lower, self.ball_color_upper, dst=self._mask_buf)
 
-        # Calculate direction and speed changes
-        directions = []
-        speeds = []
+        # Apply morphological operations
+        mask = cv2.erode(mask, kernel, dst=self._morph_buf, iterations=1)
+        return cv2.dilate(mask, kernel, dst=self._mask_buf, iterations=2)
 
-        for i in range(1, len(recent)):
-            dx = recent[i][0] - recent[i-1][0]
-            dy = recent[i][1] - recent[i-1][1]
-            directions.append(np.arctan2(dy, dx))
-            speeds.append(np.sqrt(dx**2 + dy**2))
+    def _color_mask_opencl(self, frame: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        """Same as _color_mask, dispatched through OpenCL via cv2.UMat"""
+        hsv = cv2.cvtColor(cv2.UMat(frame), cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, self.ball_color_lower, self.ball_color_upper)
+        mask = cv2.erode(mask, kernel, iterations=1)
+        mask = cv2.dilate(mask, kernel, iterations=2)
 
-        # Detect shot based on trajectory characteristics
-        avg_speed = np.mean(speeds)
-        direction_change = np.std(directions)
+        # findContours only runs on the CPU
+        return mask.get()
 
-        # High speed, straight trajectory = drive
-        if avg_speed > 20 and direction_change < 0.3:
-            return ShotType.DRIVE
+    def update(self, position: Tuple[float, float]):
+        """Record a detected ball position, in frame order"""
+        # Calculate velocity
+        if self.last_position:
+            self.velocity = (
+                position[0] - self.last_position[0],
+                position[1] - self.last_position[1]
+            )
 
-        # Low speed, short trajectory = dink
-        if avg_speed < 8 and len(self.ball_history) > 10:
-            return ShotType.DINK
+        self.last_position = position
 
-        # Upward trajectory = lob
-        if len(directions) > 2 and all(d < -0.5 for d in directions[-3:]):
-            return ShotType.LOB
+        i = self.history_index
+        self.ball_history[i] = position
+        self.ball_history[i + self.HISTORY_SIZE] = position
+        self.history_index = (i + 1) % self.HISTORY_SIZE
+        self.history_len = min(self.history_len + 1, self.HISTORY_SIZE)
 
-        # Downward with medium speed = drop
-        if avg_speed < 15 and len(directions) > 2 and all(d > 0.3 for d in directions[-3:]):
-            return ShotType.DROP
+    def recent_positions(self, n: int) -> np.ndarray:
+        """Return the last n positions (oldest first) as an (n, 2) view"""
+        end = self.history_index + self.HISTORY_SIZE
+        return self.ball_history[end - n:end]
 
-        return ShotType.UNKNOWN
+    def get_speed(self) -> float:
+        """Get ball speed in source-resolution pixels per frame (for reporting)"""
+        return math.hypot(self.velocity[0], self.velocity[1])
+
+    def detect_shot(self) -> Optional[ShotType]:
+        """
+        Analyze ball trajectory to detect shot type.
+        Returns shot type if a shot was just made, None otherwise.
+        """
+        if self.history_len < 5:
+            return None
+
+        code = _classify_trajectory(self.recent_positions(5), self.history_len)
+        return TRAJECTORY_SHOT_TYPES[code]
 
 
 class PlayerTracker:
     """Tracks player positions and movements using pose estimation"""
 
-    def __init__(self):
+    PLAYER_IDS = (0, 1, 2, 3)
+
+    def __init__(self, model_complexity: int = 0, smooth_landmarks: bool = False):
+        """
+        Args:
+            model_complexity: MediaPipe pose model (0-2). The lightest model
+                is the default since sampled frames are too far apart for the
+                pose tracker to skip re-detection anyway.
+            smooth_landmarks: Temporal landmark smoothing; only useful when
+                fed consecutive frames.
+        """
+        self.model_complexity = model_complexity
+        self.smooth_landmarks = smooth_landmarks
+
+        # Loaded on first detection, so a tracker that only aggregates
+        # positions found elsewhere never builds the pose graph
         self.pose = None
-        if MEDIAPIPE_AVAILABLE:
-            self.pose = mp.solutions.pose.Pose(
-                static_image_mode=False,
-                model_complexity=1,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5
-            )
 
+        # Scratch buffer for the RGB copy MediaPipe needs
+        self._rgb_buf = None
+
+        self.reset()
+
+    def reset(self):
+        """Forget all tracked positions (keeps the loaded pose model)"""
         self.player_positions = {}
-        self.position_history = {0: [], 1: [], 2: [], 3: []}
+
+        # Running [min_x, max_x, min_y, max_y] and sample count per player,
+        # so coverage queries are O(1)
+        self.position_bounds = {pid: [np.inf, -np.inf, np.inf, -np.inf] for pid in self.PLAYER_IDS}
+        self.position_counts = {pid: 0 for pid in self.PLAYER_IDS}
 
     def detect_players(self, frame: np.ndarray) -> List[Tuple[int, float, float]]:
         """
         Detect player positions in frame.
         Returns list of (player_id, x, y) tuples.
         """
-        if not MEDIAPIPE_AVAILABLE or self.pose is None:
+        players = self.locate_players(frame)
+        self.update(players)
+        return players
+
+    def locate_players(self, frame: np.ndarray) -> List[Tuple[int, float, float]]:
+        """
+        Run pose estimation on a single frame without recording history.
+        Safe to run in a worker process.
+        """
+        if not MEDIAPIPE_AVAILABLE:
             return []
 
+        if self.pose is None:
+            self.pose = mp.solutions.pose.Pose(
+                static_image_mode=False,
+                model_complexity=self.model_complexity,
+                smooth_landmarks=self.smooth_landmarks,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+
         # Convert to RGB
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self._rgb_buf = _reuse_buffer(self._rgb_buf, frame.shape)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
 
         # Process frame
         results = self.pose.process(rgb)
@@ -444,25 +798,27 @@ class PlayerTracker:
             # Multi-player detection would need more sophisticated tracking
             players.append((0, center_x, center_y))
 
-            self.position_history[0].append((center_x, center_y))
-            if len(self.position_history[0]) > 60:
-                self.position_history[0].pop(0)
-
         return players
 
+    def update(self, players: List[Tuple[int, float, float]]):
+        """Record detected player positions, in frame order"""
+        for player_id, x, y in players:
+            bounds = self.position_bounds[player_id]
+            bounds[0] = min(bounds[0], x)
+            bounds[1] = max(bounds[1], x)
+            bounds[2] = min(bounds[2], y)
+            bounds[3] = max(bounds[3], y)
+            self.position_counts[player_id] += 1
+
     def get_court_coverage(self, player_id: int = 0) -> float:
         """Calculate court coverage percentage for a player"""
-        history = self.position_history.get(player_id, [])
-
-        if len(history) < 10:
+        if self.position_counts.get(player_id, 0) < 10:
             return 50.0  # Default
 
-        # Calculate bounding box of positions
-        xs = [p[0] for p in history]
-        ys = [p[1] for p in history]
-
-        x_range = max(xs) - min(xs)
-        y_range = max(ys) - min(ys)
+        # Bounding box of all positions seen so far
+        min_x, max_x, min_y, max_y = self.position_bounds[player_id]
+        x_range = max_x - min_x
+        y_range = max_y - min_y
 
         # Coverage is area covered relative to court size
         coverage = (x_range * y_range) * 100 * 2  # Scale up
@@ -476,23 +832,88 @@ class PlayerTracker:
         return 1.2  # seconds
 
 
+# Per-process trackers for parallel analysis (created lazily in each worker)
+_worker_ball_tracker = None
+_worker_player_tracker = None
+
+
+def _detect_frame(frame_number: int, frame: np.ndarray, scale: float):
+    """Worker entry point: run ball + pose detection on one frame"""
+    global _worker_ball_tracker, _worker_player_tracker
+
+    if _worker_ball_tracker is None:
+        _worker_ball_tracker = BallTracker()
+        _worker_player_tracker = PlayerTracker()
+
+    return (
+        frame_number,
+        _worker_ball_tracker.locate_ball(frame, scale),
+        _worker_player_tracker.locate_players(frame)
+    )
+
+
 class PickleballAnalyzer:
     """Main video analysis class"""
 
-    def __init__(self):
+    # Frames are downscaled to this width before running the CV pipeline
+    ANALYSIS_WIDTH = 640
+
+    def __init__(self, workers: Optional[int] = None, keep_movements: bool = False,
+                 movements_path: Optional[str] = None):
+        """
+        Args:
+            workers: Number of detection worker processes. Defaults to half
+                the CPU count; 1 or less runs everything in-process.
+            keep_movements: Retain every per-frame player sample in
+                results.movements. Off by default: the aggregate stats only
+                need the trackers' running state, so memory stays flat
+                regardless of video length.
+            movements_path: With keep_movements, back the samples with
+                np.memmap files at this path prefix instead of RAM.
+
+        An analyzer can be reused for many videos; the pose model and the
+        detection worker processes are only loaded once. Call close() when
+        done with it.
+
+        Worker processes are spawned, so scripts using workers > 1 must
+        start analysis under an ``if __name__ == "__main__":`` guard.
+        """
+        self.player_tracker = PlayerTracker()
+
+        if workers is None:
+            workers = (os.cpu_count() or 2) // 2
+        self.workers = workers
+        self.keep_movements = keep_movements
+        self.movements_path = movements_path
+
+        # Detection worker processes, started on first use
+        self._pool = None
+
+        self.reset()
+
+    def reset(self):
+        """Clear all per-video state before analyzing a new video"""
         self.court_detector = CourtDetector()
         self.ball_tracker = BallTracker()
-        self.player_tracker = PlayerTracker()
+        self.player_tracker.reset()
 
         # Analysis state
-        self.shots = []
-        self.movements = []
+        self.fps = 0.0
+        self.last_shot_frame = 0
+        self.shots = ShotLog()
+        self.movements = MovementLog(path=self.movements_path) if self.keep_movements else None
         self.rally_count = 0
         self.current_rally_length = 0
         self.rally_lengths = []
         self.unforced_errors = 0
         self.winners = 0
 
+    def close(self):
+        """Stop the detection worker processes"""
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
     def analyze_video(self, video_path: str, progress_callback=None) -> AnalysisResults:
         """
         Analyze a complete video file.
@@ -509,6 +930,8 @@ class PickleballAnalyzer:
         if not cap.isOpened():
             raise ValueError(f"Could not open video: {video_path}")
 
+        self.reset()
+
         # Get video properties
         fps = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -516,94 +939,162 @@ class PickleballAnalyzer:
 
         print(f"Analyzing video: {duration:.1f}s, {total_frames} frames @ {fps:.1f} fps")
 
-        frame_number = 0
-        last_shot_frame = 0
+        frame_number = -1  # Incremented at the top of each iteration
+        self.fps = fps
+        self.last_shot_frame = 0
 
         # Process every Nth frame for efficiency
         frame_skip = max(1, int(fps / 10))  # ~10 samples per second
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            # Skip frames for efficiency
-            if frame_number % frame_skip != 0:
+        # Report progress roughly every 1%. The container's frame count is
+        # only an estimate (e.g. VFR video), so never divide by zero.
+        progress_step = max(1, total_frames // 100)
+        progress_total = max(1, total_frames)
+
+        # Downscale factor and source frame shape, from the first decoded frame
+        scale = None
+        source_shape = None
+
+        # Ball/pose detection fans out to worker processes; results are
+        # folded back into the trackers in frame order
+        if self.workers > 1 and self._pool is None:
+            # spawn: forking after MediaPipe/OpenCL have started their
+            # threads can deadlock the children
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        pool = self._pool
+        pending = deque()
+        max_pending = self.workers * 2
+
+        # OpenCV and MediaPipe release the GIL, so independent detectors on
+        # the same frame can overlap in threads
+        threads = ThreadPoolExecutor(max_workers=2)
+
+        try:
+            while True:
+                # grab() only demuxes; the costly decode happens in retrieve()
+                if not cap.grab():
+                    break
                 frame_number += 1
-                continue
-
-            timestamp = frame_number / fps
 
-            # Detect court (only first few frames)
-            if frame_number < fps * 2:  # First 2 seconds
-                self.court_detector.detect_court(frame)
-
-            # Track ball
-            ball_pos = self.ball_tracker.detect_ball(frame)
-
-            # Detect shot
-            if ball_pos:
-                shot_type = self.ball_tracker.detect_shot()
-
-                if shot_type and shot_type != ShotType.UNKNOWN:
-                    # Avoid double-detection (minimum 0.3s between shots)
-                    if frame_number - last_shot_frame > fps * 0.3:
-                        shot = DetectedShot(
-                            frame_number=frame_number,
-                            timestamp=timestamp,
-                            shot_type=shot_type,
-                            player_id=0,
-                            ball_speed=self.ball_tracker.get_speed(),
-                            placement_x=ball_pos[0] / frame.shape[1],
-                            placement_y=ball_pos[1] / frame.shape[0],
-                            confidence=0.7
-                        )
-                        self.shots.append(shot)
-                        last_shot_frame = frame_number
-                        self.current_rally_length += 1
-
-            # Track players
-            players = self.player_tracker.detect_players(frame)
-
-            for player_id, px, py in players:
-                movement = PlayerMovement(
-                    frame_number=frame_number,
-                    timestamp=timestamp,
-                    player_id=player_id,
-                    position_x=px,
-                    position_y=py,
-                    velocity=0  # Would need calculation
-                )
-                self.movements.append(movement)
+                # Skip frames for efficiency
+                if frame_number % frame_skip != 0:
+                    continue
+
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+
+                # Work at a fixed resolution; never upscale small sources
+                if scale is None:
+                    source_shape = frame.shape
+                    scale = min(1.0, self.ANALYSIS_WIDTH / frame.shape[1])
+                if scale < 1.0:
+                    frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+                # Trackers and MediaPipe would each copy a strided frame
+                # internally; make it contiguous once here instead
+                if not frame.flags['C_CONTIGUOUS']:
+                    frame = np.ascontiguousarray(frame)
+
+                # Detect court (first 2 seconds, until one detection succeeds)
+                court_future = None
+                if self.court_detector.court_corners is None and frame_number < fps * 2:
+                    court_future = threads.submit(self.court_detector.detect_court, frame, scale)
+
+                if pool:
+                    pending.append(pool.submit(_detect_frame, frame_number, frame, scale))
+                    if len(pending) >= max_pending:
+                        self._record_frame(*pending.popleft().result(), source_shape)
+                else:
+                    # Ball detection overlaps pose estimation, which stays on
+                    # this thread so the Pose instance is never shared
+                    ball_future = threads.submit(self.ball_tracker.locate_ball, frame, scale)
+                    players = self.player_tracker.locate_players(frame)
+                    self._record_frame(frame_number, ball_future.result(), players, source_shape)
+
+                if court_future:
+                    court_future.result()
+
+                # Progress callback
+                if progress_callback and frame_number % progress_step == 0:
+                    progress_callback(min(1.0, frame_number / progress_total))
+
+            while pending:
+                self._record_frame(*pending.popleft().result(), source_shape)
+        finally:
+            cap.release()
+            threads.shutdown()
+            # Only left over if analysis stopped early
+            for future in pending:
+                future.cancel()
 
-            # Progress callback
-            if progress_callback and frame_number % (total_frames // 10) == 0:
-                progress_callback(frame_number / total_frames)
+        # Compile results
+        return self._compile_results(duration, total_frames, fps)
 
-            frame_number += 1
+    def _record_frame(self, frame_number: int, ball_pos: Optional[Tuple[float, float]],
+                      players: List[Tuple[int, float, float]], frame_shape: Tuple[int, ...]):
+        """Apply one frame's detections to tracking state (must be called in frame order)"""
+        timestamp = frame_number / self.fps
 
-        cap.release()
+        # Track ball
+        if ball_pos:
+            self.ball_tracker.update(ball_pos)
 
-        # Compile results
-        return self._compile_results(duration, total_frames, fps)
+            # Detect shot
+            shot_type = self.ball_tracker.detect_shot()
+
+            if shot_type and shot_type != ShotType.UNKNOWN:
+                # Avoid double-detection (minimum 0.3s between shots)
+                if frame_number - self.last_shot_frame > self.fps * 0.3:
+                    self.shots.append(
+                        frame_number=frame_number,
+                        timestamp=timestamp,
+                        shot_type=shot_type,
+                        player_id=0,
+                        ball_speed=self.ball_tracker.get_speed(),
+                        placement_x=ball_pos[0] / frame_shape[1],
+                        placement_y=ball_pos[1] / frame_shape[0],
+                        confidence=0.7
+                    )
+                    self.last_shot_frame = frame_number
+                    self.current_rally_length += 1
+
+        # Track players
+        self.player_tracker.update(players)
+
+        if self.movements is None:
+            return
+
+        for player_id, px, py in players:
+            self.movements.append(
+                frame_number=frame_number,
+                timestamp=timestamp,
+                player_id=player_id,
+                position_x=px,
+                position_y=py,
+                velocity=0  # Would need calculation
+            )
 
     def _compile_results(self, duration: float, total_frames: int, fps: float) -> AnalysisResults:
         """Compile all analysis data into results object"""
 
         # Count shots by type
-        shot_breakdown = {}
-        for shot in self.shots:
-            shot_type = shot.shot_type.value
-            shot_breakdown[shot_type] = shot_breakdown.get(shot_type, 0) + 1
+        counts = np.bincount(self.shots.column('shot_type'), minlength=len(SHOT_TYPE_CODES))
+        shot_breakdown = {
+            shot_type.value: int(count)
+            for shot_type, count in zip(SHOT_TYPE_CODES, counts) if count
+        }
 
         # Calculate placement accuracy
-        placements = [(s.placement_x, s.placement_y) for s in self.shots if s.placement_x is not None]
+        placements = self.shots.placements()
         placement_accuracy = 70.0  # Default
-        if placements:
+        if len(placements):
             # Higher accuracy if shots are well distributed (not all center)
-            x_variance = np.var([p[0] for p in placements])
-            y_variance = np.var([p[1] for p in placements])
-            placement_accuracy = min(95, 50 + x_variance * 100 + y_variance * 100)
+            x_variance, y_variance = placements.var(axis=0)
+            placement_accuracy = float(min(95, 50 + x_variance * 100 + y_variance * 100))
 
         # Estimate rally lengths (simplified)
         if not self.rally_lengths:
@@ -613,6 +1104,10 @@ class PickleballAnalyzer:
                 estimated_rally = max(3, int(5 / avg_time_between_shots))
                 self.rally_lengths = [estimated_rally] * (len(self.shots) // estimated_rally)
 
+        # Estimate reaction time from the gaps between consecutive shots
+        shot_gaps_ms = np.diff(self.shots.column('frame_number')) / fps * 1000
+        avg_reaction_time_ms = int(shot_gaps_ms.mean()) if shot_gaps_ms.size else 300
+
         # Calculate confidence based on detection quality
         confidence = 0.5
         if len(self.shots) > 10:
@@ -628,7 +1123,7 @@ class PickleballAnalyzer:
             court_coverage=self.player_tracker.get_court_coverage(),
             avg_recovery_time=self.player_tracker.get_recovery_time(),
             placement_accuracy=placement_accuracy,
-            avg_reaction_time_ms=int(300 + np.random.normal(0, 50)),  # Placeholder
+            avg_reaction_time_ms=avg_reaction_time_ms,
             rally_lengths=self.rally_lengths if self.rally_lengths else [5, 7, 4, 8, 6],
             unforced_errors=self.unforced_errors,
             winners=self.winners,
@@ -663,7 +1158,10 @@ def analyze_video_file(video_path: str, output_path: str = None) -> dict:
     def progress(p):
         print(f"Progress: {p*100:.1f}%")
 
-    results = analyzer.analyze_video(video_path, progress_callback=progress)
+    try:
+        results = analyzer.analyze_video(video_path, progress_callback=progress)
+    finally:
+        analyzer.close()
     results_dict = results.to_dict()
 
     if output_path:
@@ -6,6 +6,7 @@ FastAPI server for processing video uploads and returning analysis results.
 Designed to run on a separate server/container with GPU support.
 
 Run with: uvicorn api_server:app --host 0.0.0.0 --port 8000
+Jobs are queued in Redis (job_store.py) and processed by worker.py.
 
 Endpoints:
     POST /analyze - Upload video for analysis
@@ -13,23 +14,27 @@ Endpoints:
     GET /results/{job_id} - Get analysis results
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+import errno
+import io
+import re
 import uuid
 import os
-import json
 import asyncio
+import threading
 from datetime import datetime
-import aiofiles
 
-from analyzer import PickleballAnalyzer, analyze_video_file
+from job_store import JobStore
 
 app = FastAPI(
     title="Pickleball Video Analysis API",
     description="AI-powered video analysis for player stat extraction",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -45,17 +50,51 @@ app.add_middleware(
 UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "/tmp/video-uploads")
 RESULTS_DIR = os.environ.get("RESULTS_DIR", "/tmp/video-results")
 
+# Video formats accepted by /analyze
+ALLOWED_CONTENT_TYPES = frozenset({"video/mp4", "video/quicktime", "video/x-msvideo", "video/webm"})
+INVALID_TYPE_DETAIL = f"Invalid file type. Allowed: {', '.join(sorted(ALLOWED_CONTENT_TYPES))}"
+
+# Container signatures checked against the start of each upload
+VIDEO_HEADER_SIZE = 12
+QUICKTIME_ATOMS = frozenset({b"ftyp", b"moov", b"mdat", b"wide", b"free", b"skip"})  # MP4/MOV box types
+RIFF_MAGIC = b"RIFF"  # AVI
+EBML_MAGIC = b"\x1aE\xdf\xa3"  # Matroska/WebM
+
+# Uploads are copied to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Concurrent upload writers; the handoff queue holds twice as many uploads
+UPLOAD_WRITERS = int(os.environ.get("UPLOAD_WRITERS", "4"))
+
+# How often to delete files left behind by expired jobs (seconds)
+SWEEP_INTERVAL = 60
+
+# Job files are "{job_id}_{filename}" (uploads) or "{job_id}.json" (results);
+# anything else in the directories is left alone
+JOB_FILE_PATTERN = re.compile(r"([0-9a-f]{32})[_.]")
+
 # Ensure directories exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
-# In-memory job tracking (use Redis in production)
-jobs: Dict[str, Dict[str, Any]] = {}
+# sendfile() errors meaning "can't copy file-to-file here", not an I/O failure
+SENDFILE_UNSUPPORTED = frozenset({errno.EINVAL, errno.ENOTSOCK, errno.ENOSYS, errno.EOPNOTSUPP})
+
+# Per-thread copy buffer for uploads that can't use sendfile, allocated once
+_copy_buffer = threading.local()
+
+# Redis-backed job store, connected on startup
+store: Optional[JobStore] = None
+
+# Uploads waiting to be persisted, drained by the writer tasks
+upload_queue: Optional[asyncio.Queue] = None
+upload_writers = []
+sweeper: Optional[asyncio.Task] = None
 
 
 class JobStatus(BaseModel):
     job_id: str
-    status: str  # pending, processing, completed, failed
+    status: str  # uploading, pending, processing, completed, failed
     progress: float
     created_at: str
     completed_at: Optional[str] = None
@@ -77,6 +116,158 @@ class WebhookConfig(BaseModel):
     avatar_id: str
 
 
+def is_video_header(header: bytes) -> bool:
+    """Whether the first bytes of a file look like a supported video container"""
+    return (
+        header[4:8] in QUICKTIME_ATOMS
+        or header[:4] == RIFF_MAGIC
+        or header[:4] == EBML_MAGIC
+    )
+
+
+def detach_upload(video: UploadFile):
+    """
+    Return a file object with the upload's contents that stays valid after
+    the request finishes (FastAPI closes the UploadFile itself).
+    """
+    src = video.file
+    src.seek(0)
+    if getattr(src, '_rolled', False):
+        # Spooled to a temp file: share it through a duplicated descriptor
+        return os.fdopen(os.dup(src.fileno()), 'rb')
+    return io.BytesIO(src.read())
+
+
+def save_upload(src, file_path: str):
+    """
+    Persist a detached upload to file_path. Runs in a worker thread.
+
+    Large uploads have already been spooled to a temp file by Starlette, so
+    they are copied in-kernel with sendfile() where the platform allows a
+    regular file as the destination (Linux); small in-memory ones are
+    written straight from their buffer.
+    """
+    try:
+        src_fd = src.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        src_fd = None
+
+    with open(file_path, 'wb') as dst:
+        if src_fd is not None and hasattr(os, 'sendfile'):
+            dst_fd = dst.fileno()
+            size = os.fstat(src_fd).st_size
+
+            offset = 0
+            while offset < size:
+                try:
+                    sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                except OSError as e:
+                    # macOS/BSD sendfile() only writes to sockets
+                    if offset or e.errno not in SENDFILE_UNSUPPORTED:
+                        raise
+                    src.seek(0)
+                    copy_chunks(src, dst)
+                    break
+                if sent == 0:
+                    break
+                offset += sent
+        elif isinstance(src, io.BytesIO):
+            # Small upload already in memory: write it without copying
+            dst.write(src.getbuffer())
+        else:
+            copy_chunks(src, dst)
+
+
+def copy_chunks(src, dst):
+    """Copy src to dst through a reused per-thread buffer (no per-chunk allocation)"""
+    buffer = getattr(_copy_buffer, "view", None)
+    if buffer is None:
+        buffer = _copy_buffer.view = memoryview(bytearray(UPLOAD_CHUNK_SIZE))
+
+    while n := src.readinto(buffer):
+        dst.write(buffer[:n])
+
+
+async def upload_writer():
+    """Persist queued uploads, then hand their jobs to the analysis workers"""
+    while True:
+        job_id, src, file_path = await upload_queue.get()
+        try:
+            await asyncio.to_thread(save_upload, src, file_path)
+            if not await store.enqueue(job_id):
+                # Deleted while uploading
+                await asyncio.to_thread(remove_files, [file_path])
+        except Exception as e:
+            try:
+                await store.finish(
+                    job_id,
+                    "failed",
+                    error=f"Could not save upload: {e}",
+                    completed_at=datetime.utcnow().isoformat()
+                )
+            except Exception as e:
+                # Left as "uploading"; it expires and its file is swept
+                print(f"Could not record failed upload {job_id}: {e}")
+        finally:
+            src.close()
+            upload_queue.task_done()
+
+
+def list_job_files():
+    """(job_id, path) for every upload and results file on disk"""
+    files = []
+    # The two directories may be the same; list each only once
+    for directory in {os.path.realpath(UPLOAD_DIR), os.path.realpath(RESULTS_DIR)}:
+        for name in os.listdir(directory):
+            match = JOB_FILE_PATTERN.match(name)
+            if match:
+                files.append((match.group(1), os.path.join(directory, name)))
+    return files
+
+
+def remove_files(paths):
+    """Best-effort unlink; files that are already gone are skipped"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def sweep_expired_files():
+    """Delete uploads and results whose job has expired from the store"""
+    while True:
+        try:
+            files = await asyncio.to_thread(list_job_files)
+            live = await store.existing(list({job_id for job_id, _ in files}))
+            orphaned = [path for job_id, path in files if job_id not in live]
+            if orphaned:
+                await asyncio.to_thread(remove_files, orphaned)
+        except Exception as e:
+            print(f"File sweep failed: {e}")
+
+        await asyncio.sleep(SWEEP_INTERVAL)
+
+
+@app.on_event("startup")
+async def startup():
+    global store, upload_queue, sweeper
+    store = JobStore.from_url()
+    upload_queue = asyncio.Queue(maxsize=UPLOAD_WRITERS * 2)
+    upload_writers.extend(asyncio.create_task(upload_writer()) for _ in range(UPLOAD_WRITERS))
+    sweeper = asyncio.create_task(sweep_expired_files())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Finish writing accepted uploads before exiting
+    await upload_queue.join()
+    for task in upload_writers:
+        task.cancel()
+    sweeper.cancel()
+    await store.close()
+
+
 @app.get("/")
 async def root():
     return {
@@ -93,7 +284,6 @@ async def root():
 
 @app.post("/analyze")
 async def analyze_video(
-    background_tasks: BackgroundTasks,
     video: UploadFile = File(...),
     avatar_id: Optional[str] = None,
     webhook_url: Optional[str] = None
@@ -108,143 +298,83 @@ async def analyze_video(
     Returns job_id for tracking progress.
     """
     # Validate file type
-    allowed_types = ["video/mp4", "video/quicktime", "video/x-msvideo", "video/webm"]
-    if video.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
-        )
+    if video.content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail=INVALID_TYPE_DETAIL)
+
+    # Don't trust the client's header: check the file really is a video
+    # before creating a job or copying anything
+    header = await video.read(VIDEO_HEADER_SIZE)
+    if not is_video_header(header):
+        raise HTTPException(status_code=415, detail="File contents are not a supported video format")
 
     # Generate job ID
-    job_id = str(uuid.uuid4())
+    job_id = uuid.uuid4().hex
 
-    # Save uploaded file
     file_path = os.path.join(UPLOAD_DIR, f"{job_id}_{video.filename}")
 
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await video.read()
-        await f.write(content)
-
-    # Create job record
-    jobs[job_id] = {
+    # Create job record; it is queued for the workers once the file is saved
+    await store.create({
         "job_id": job_id,
-        "status": "pending",
+        "status": "uploading",
         "progress": 0.0,
         "created_at": datetime.utcnow().isoformat(),
         "file_path": file_path,
         "avatar_id": avatar_id,
         "webhook_url": webhook_url,
         "completed_at": None,
-        "error": None,
-        "results": None
-    }
+        "error": None
+    }, enqueue=False)
 
-    # Start background processing
-    background_tasks.add_task(process_video, job_id)
+    # Save uploaded file in the background; waits only if the writers are
+    # already backed up
+    await upload_queue.put((job_id, detach_upload(video), file_path))
 
     return {
         "job_id": job_id,
-        "status": "pending",
-        "message": "Video uploaded successfully. Processing started.",
+        "status": "uploading",
+        "message": "Video uploaded successfully. Processing will start shortly.",
         "status_url": f"/status/{job_id}",
         "results_url": f"/results/{job_id}"
     }
 
 
-async def process_video(job_id: str):
-    """Background task to process video"""
-    job = jobs.get(job_id)
-    if not job:
-        return
-
-    try:
-        # Update status
-        job["status"] = "processing"
-        job["progress"] = 0.1
-
-        # Create analyzer
-        analyzer = PickleballAnalyzer()
-
-        def update_progress(p: float):
-            job["progress"] = 0.1 + (p * 0.8)  # 10-90%
-
-        # Run analysis
-        results = analyzer.analyze_video(
-            job["file_path"],
-            progress_callback=update_progress
-        )
-
-        # Convert to dict
-        results_dict = results.to_dict()
-
-        # Save results
-        results_path = os.path.join(RESULTS_DIR, f"{job_id}.json")
-        async with aiofiles.open(results_path, 'w') as f:
-            await f.write(json.dumps(results_dict, indent=2))
-
-        # Update job
-        job["status"] = "completed"
-        job["progress"] = 1.0
-        job["completed_at"] = datetime.utcnow().isoformat()
-        job["results"] = results_dict
-
-        # Call webhook if configured
-        if job.get("webhook_url"):
-            await call_webhook(job["webhook_url"], job_id, results_dict)
-
-        # Clean up video file (optional)
-        # os.remove(job["file_path"])
-
-    except Exception as e:
-        job["status"] = "failed"
-        job["error"] = str(e)
-        job["completed_at"] = datetime.utcnow().isoformat()
-
-
-async def call_webhook(url: str, job_id: str, results: dict):
-    """Call webhook URL with results"""
-    import aiohttp
-
-    try:
-        async with aiohttp.ClientSession() as session:
-            await session.post(url, json={
-                "job_id": job_id,
-                "status": "completed",
-                "avatar_stats": results.get("avatar_stats"),
-                "shot_breakdown": results.get("shot_breakdown"),
-                "confidence": results.get("overall_confidence")
-            })
-    except Exception as e:
-        print(f"Webhook call failed: {e}")
-
+@app.get("/status/{job_id}", responses={200: {"model": JobStatus}})
+async def get_status(job_id: str) -> ORJSONResponse:
+    """
+    Get the status of an analysis job.
 
-@app.get("/status/{job_id}", response_model=JobStatus)
-async def get_status(job_id: str):
-    """Get the status of an analysis job"""
-    job = jobs.get(job_id)
+    Clients poll this every second or two, so the JobStatus fields are
+    returned as a plain dict without model validation.
+    """
+    job = await store.get(job_id)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    return JobStatus(
-        job_id=job["job_id"],
-        status=job["status"],
-        progress=job["progress"],
-        created_at=job["created_at"],
-        completed_at=job.get("completed_at"),
-        error=job.get("error")
-    )
+    return ORJSONResponse({
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "created_at": job["created_at"],
+        "completed_at": job.get("completed_at"),
+        "error": job.get("error")
+    })
 
 
-@app.get("/results/{job_id}", response_model=AnalysisResult)
+@app.get("/results/{job_id}", responses={200: {"model": AnalysisResult}})
 async def get_results(job_id: str):
-    """Get the results of a completed analysis job"""
-    job = jobs.get(job_id)
+    """
+    Get the results of a completed analysis job.
+
+    The worker saves results already shaped as AnalysisResult, so the file
+    is sent straight from disk without being loaded or re-encoded.
+    """
+    job = await store.get(job_id)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    if job["status"] == "pending":
+    if job["status"] in ("uploading", "pending"):
         raise HTTPException(status_code=202, detail="Analysis not yet started")
 
     if job["status"] == "processing":
@@ -256,40 +386,30 @@ async def get_results(job_id: str):
     if job["status"] == "failed":
         raise HTTPException(status_code=500, detail=job.get("error", "Analysis failed"))
 
-    results = job.get("results", {})
+    results_path = os.path.join(RESULTS_DIR, f"{job_id}.json")
+    if not os.path.exists(results_path):
+        raise HTTPException(status_code=404, detail="Results not found")
 
-    return AnalysisResult(
-        job_id=job_id,
-        status=job["status"],
-        video_duration=results.get("video_duration"),
-        shot_breakdown=results.get("shot_breakdown"),
-        avatar_stats=results.get("avatar_stats"),
-        confidence=results.get("overall_confidence"),
-        full_results=results
-    )
+    return FileResponse(results_path, media_type="application/json")
 
 
 @app.delete("/jobs/{job_id}")
 async def delete_job(job_id: str):
     """Delete a job and its associated files"""
-    job = jobs.get(job_id)
+    job = await store.get(job_id)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    # Delete files
+    # Delete files off the event loop (unlinking a large video can block)
+    paths = [job.get("file_path"), os.path.join(RESULTS_DIR, f"{job_id}.json")]
     try:
-        if os.path.exists(job.get("file_path", "")):
-            os.remove(job["file_path"])
-
-        results_path = os.path.join(RESULTS_DIR, f"{job_id}.json")
-        if os.path.exists(results_path):
-            os.remove(results_path)
+        await asyncio.to_thread(remove_files, [path for path in paths if path])
     except Exception as e:
         pass  # Ignore file deletion errors
 
-    # Remove from memory
-    del jobs[job_id]
+    # Remove from the store
+    await store.delete(job_id)
 
     return {"message": "Job deleted successfully"}
 
@@ -300,11 +420,19 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "active_jobs": len([j for j in jobs.values() if j["status"] == "processing"])
+        "active_jobs": len(await store.processing())
     }
 
 
 # Run with: uvicorn api_server:app --reload
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Jobs live in Redis, so any number of server processes can share them.
+    # uvicorn picks uvloop/httptools automatically when they are installed.
+    uvicorn.run(
+        "api_server:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.environ.get("API_WORKERS", os.cpu_count() or 1)),
+        log_level="warning"
+    )
@@ -0,0 +1,264 @@
+"""
+🗂️ ANALYSIS JOB STORE
+Ray's Pickleball Platform
+
+Redis-backed job queue shared by the API server and the analysis workers.
+Jobs survive restarts and any number of API/worker processes can share them.
+
+Keys:
+    queue:jobs:job:{job_id}  - hash of job metadata (values JSON-encoded)
+    queue:jobs:pending       - job ids waiting for a worker (LPUSH / BRPOPLPUSH)
+    queue:jobs:processing    - job ids claimed by a worker
+    queue:jobs:claims        - zset of claimed job id -> last heartbeat time
+    queue:jobs:completed     - recent completed job ids (capped)
+    queue:jobs:failed        - recent failed job ids (capped)
+    webhook:dlq              - webhooks that failed every retry, for later redelivery
+
+Finished jobs expire JOB_TTL seconds after completing, and jobs whose
+upload never finished (e.g. the API server died mid-copy) expire after
+UPLOAD_TTL; the API server removes their files once the metadata is gone.
+
+Delivery is at-least-once: a claimed job whose worker stops heartbeating
+for VISIBILITY_TIMEOUT seconds is moved back to pending by reclaim_stale().
+
+Writes to an existing job only apply while its hash exists, so a job
+deleted mid-flight is never recreated by a late progress update.
+
+Requirements:
+    pip install redis
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import redis as redis_sync
+import redis.asyncio as redis
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+KEY_PREFIX = "queue:jobs"
+PENDING_KEY = f"{KEY_PREFIX}:pending"
+PROCESSING_KEY = f"{KEY_PREFIX}:processing"
+COMPLETED_KEY = f"{KEY_PREFIX}:completed"
+FAILED_KEY = f"{KEY_PREFIX}:failed"
+CLAIMS_KEY = f"{KEY_PREFIX}:claims"
+WEBHOOK_DLQ_KEY = "webhook:dlq"
+
+# How many finished job ids to keep in the completed/failed lists
+HISTORY_LIMIT = 1000
+
+# Seconds a finished job's metadata is kept before Redis expires it
+JOB_TTL = int(os.environ.get("JOB_TTL", "3600"))
+
+# Seconds a job may stay unqueued (still uploading) before Redis expires it
+UPLOAD_TTL = int(os.environ.get("JOB_UPLOAD_TTL", "3600"))
+
+# Seconds a claimed job may go without a heartbeat before it is requeued
+VISIBILITY_TIMEOUT = int(os.environ.get("JOB_VISIBILITY_TIMEOUT", "300"))
+
+
+def job_key(job_id: str) -> str:
+    return f"{KEY_PREFIX}:job:{job_id}"
+
+
+def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+    return {name: json.dumps(value) for name, value in fields.items()}
+
+
+def _decode(fields: Dict[str, str]) -> Dict[str, Any]:
+    return {name: json.loads(value) for name, value in fields.items()}
+
+
+def _hset_args(fields: Dict[str, Any]) -> List[str]:
+    """Encoded fields flattened to [name, value, ...] for a Lua HSET"""
+    return [item for pair in _encode(fields).items() for item in pair]
+
+
+# KEYS: job hash. ARGV: field/value pairs. Returns 1 if the job existed.
+_UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+# KEYS: job hash, processing, claims, history.
+# ARGV: job id, TTL, history limit, field/value pairs.
+_FINISH_SCRIPT = """
+redis.call('LREM', KEYS[2], 1, ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('LPUSH', KEYS[4], ARGV[1])
+redis.call('LTRIM', KEYS[4], 0, tonumber(ARGV[3]) - 1)
+return 1
+"""
+
+
+# KEYS: job hash, pending. ARGV: job id, field/value pairs.
+_ENQUEUE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('PERSIST', KEYS[1])
+redis.call('LPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+# Registered on first use; the client is passed on every call, so it works
+# for any sync client
+_update_sync_script = None
+
+
+def update_sync(client: "redis_sync.Redis", job_id: str, **fields: Any) -> bool:
+    """JobStore.update for synchronous code (e.g. inside the analysis process)"""
+    global _update_sync_script
+    if _update_sync_script is None:
+        _update_sync_script = client.register_script(_UPDATE_SCRIPT)
+    return bool(_update_sync_script(keys=[job_key(job_id)], args=_hset_args(fields), client=client))
+
+
+class JobStore:
+    """Async job queue + metadata store on top of Redis"""
+
+    def __init__(self, client: redis.Redis):
+        self.redis = client
+        self._update = client.register_script(_UPDATE_SCRIPT)
+        self._finish = client.register_script(_FINISH_SCRIPT)
+        self._enqueue = client.register_script(_ENQUEUE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str = REDIS_URL) -> "JobStore":
+        return cls(redis.from_url(url, decode_responses=True))
+
+    async def close(self):
+        await self.redis.aclose()
+
+    async def create(self, job: Dict[str, Any], enqueue: bool = True):
+        """
+        Store a new job and (unless enqueue is False) queue it for the
+        workers. An unqueued job expires after UPLOAD_TTL unless enqueue()
+        is called for it.
+        """
+        job_id = job["job_id"]
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(job_key(job_id), mapping=_encode(job))
+            if enqueue:
+                pipe.lpush(PENDING_KEY, job_id)
+            else:
+                pipe.expire(job_key(job_id), UPLOAD_TTL)
+            await pipe.execute()
+
+    async def enqueue(self, job_id: str) -> bool:
+        """Queue an existing job for the workers. Returns False if it was deleted."""
+        return bool(await self._enqueue(
+            keys=[job_key(job_id), PENDING_KEY],
+            args=[job_id, *_hset_args({"status": "pending"})]
+        ))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job's metadata, or None if it doesn't exist"""
+        fields = await self.redis.hgetall(job_key(job_id))
+        return _decode(fields) if fields else None
+
+    async def update(self, job_id: str, **fields: Any) -> bool:
+        """Set fields on an existing job. Returns False (and writes nothing) if it was deleted."""
+        return bool(await self._update(keys=[job_key(job_id)], args=_hset_args(fields)))
+
+    async def claim(self, timeout: int = 5) -> Optional[str]:
+        """Block up to timeout seconds for a pending job and move it to processing"""
+        job_id = await self.redis.brpoplpush(PENDING_KEY, PROCESSING_KEY, timeout)
+        if job_id:
+            await self.heartbeat(job_id)
+        return job_id
+
+    async def heartbeat(self, job_id: str):
+        """Mark a claimed job as still being worked on"""
+        await self.redis.zadd(CLAIMS_KEY, {job_id: time.time()})
+
+    async def release(self, job_id: str):
+        """Drop a claim without recording a result (e.g. the job was deleted)"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(PROCESSING_KEY, 0, job_id)
+            pipe.zrem(CLAIMS_KEY, job_id)
+            await pipe.execute()
+
+    async def finish(self, job_id: str, status: str, **fields: Any) -> bool:
+        """
+        Record a job's final status and move it to the completed/failed
+        history. The claim is always released; returns False if the job had
+        been deleted, in which case nothing else is written.
+        """
+        history_key = COMPLETED_KEY if status == "completed" else FAILED_KEY
+        return bool(await self._finish(
+            keys=[job_key(job_id), PROCESSING_KEY, CLAIMS_KEY, history_key],
+            args=[job_id, JOB_TTL, HISTORY_LIMIT, *_hset_args({"status": status, **fields})]
+        ))
+
+    async def delete(self, job_id: str):
+        """Remove a job's metadata and drop it from every list"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(job_key(job_id))
+            for key in (PENDING_KEY, PROCESSING_KEY, COMPLETED_KEY, FAILED_KEY):
+                pipe.lrem(key, 0, job_id)
+            pipe.zrem(CLAIMS_KEY, job_id)
+            await pipe.execute()
+
+    async def dead_letter_webhook(self, url: str, job_id: str, payload: bytes, error: str):
+        """Park a webhook that could not be delivered so it can be retried later"""
+        await self.redis.lpush(WEBHOOK_DLQ_KEY, json.dumps({
+            "url": url,
+            "job_id": job_id,
+            "payload": payload.decode(),
+            "error": error,
+            "failed_at": time.time(),
+        }))
+
+    async def existing(self, job_ids: List[str]) -> Set[str]:
+        """Return the subset of job_ids that still have metadata"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.exists(job_key(job_id))
+            found = await pipe.execute()
+        return {job_id for job_id, exists in zip(job_ids, found) if exists}
+
+    async def processing(self) -> List[str]:
+        return await self.redis.lrange(PROCESSING_KEY, 0, -1)
+
+    async def reclaim_stale(self, visibility_timeout: int = VISIBILITY_TIMEOUT) -> int:
+        """Requeue claimed jobs whose worker stopped heartbeating. Returns the count."""
+        cutoff = time.time() - visibility_timeout
+        reclaimed = 0
+
+        for job_id in await self.processing():
+            claimed_at = await self.redis.zscore(CLAIMS_KEY, job_id)
+            if claimed_at is None:
+                # Claimed but not heartbeated yet (or the worker died in
+                # between): start its clock now
+                await self.redis.zadd(CLAIMS_KEY, {job_id: time.time()}, nx=True)
+                continue
+            if claimed_at > cutoff:
+                continue
+
+            # Deleted while processing: just forget it
+            if not await self.redis.exists(job_key(job_id)):
+                await self.release(job_id)
+                continue
+
+            # Only the process that removes it from processing requeues it
+            if await self.redis.lrem(PROCESSING_KEY, 1, job_id):
+                await self.redis.zrem(CLAIMS_KEY, job_id)
+                await self.update(job_id, status="pending", progress=0.0)
+                # Right end is popped next, so retries go to the front
+                await self.redis.rpush(PENDING_KEY, job_id)
+                reclaimed += 1
+
+        return reclaimed
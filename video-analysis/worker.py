@@ -0,0 +1,265 @@
+"""
+⚙️ VIDEO ANALYSIS WORKER
+Ray's Pickleball Platform
+
+Claims analysis jobs queued by the API server (see job_store.py), runs
+them, and records the results. The analysis itself runs in a separate
+process so the worker's event loop stays free for heartbeats and
+webhooks. Run one or more next to the API server:
+
+    python worker.py
+
+Environment:
+    REDIS_URL    - Redis connection (default redis://localhost:6379/0)
+    RESULTS_DIR  - Where result JSON files are written
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import aiohttp
+import orjson
+import redis
+
+from analyzer import PickleballAnalyzer
+from job_store import JobStore, REDIS_URL, VISIBILITY_TIMEOUT, update_sync
+
+RESULTS_DIR = os.environ.get("RESULTS_DIR", "/tmp/video-results")
+
+# How often to look for jobs abandoned by crashed workers (seconds)
+RECLAIM_INTERVAL = 60
+
+# Pause after a Redis error before trying the queue again (seconds)
+REDIS_RETRY_DELAY = 5
+
+WEBHOOK_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# Delivery attempts per webhook; waits 2^attempt seconds between them
+WEBHOOK_ATTEMPTS = 3
+
+# Shared by every webhook call so connections to the same target are kept alive
+# (created in main(), which owns the event loop)
+WEBHOOK_SESSION: "aiohttp.ClientSession | None" = None
+
+# Webhook deliveries in flight, so retries never hold up the next job
+webhook_tasks = set()
+
+os.makedirs(RESULTS_DIR, exist_ok=True)
+
+
+# Per-process state for the analysis process (created lazily in the child).
+# The analyzer is reused across jobs so models and detection workers load once;
+# the pool has a single process, so jobs never share it concurrently.
+_progress_redis = None
+_analyzer = None
+
+
+def run_analysis(job_id: str, file_path: str) -> dict:
+    """
+    Analyze one video and save its results. Runs in the analysis process:
+    plain synchronous code, with progress written straight to Redis.
+    """
+    global _progress_redis, _analyzer
+
+    if _progress_redis is None:
+        _progress_redis = redis.Redis.from_url(REDIS_URL)
+    if _analyzer is None:
+        _analyzer = PickleballAnalyzer()
+
+    def update_progress(p: float):
+        update_sync(_progress_redis, job_id, progress=0.1 + (p * 0.8))  # 10-90%
+
+    # Run analysis
+    results = _analyzer.analyze_video(file_path, progress_callback=update_progress)
+
+    # Convert to dict
+    results_dict = results.to_dict()
+
+    # Save results in the shape GET /results returns, so the API can serve
+    # the file as-is
+    response = {
+        "job_id": job_id,
+        "status": "completed",
+        "video_duration": results_dict.get("video_duration"),
+        "shot_breakdown": results_dict.get("shot_breakdown"),
+        "avatar_stats": results_dict.get("avatar_stats"),
+        "confidence": results_dict.get("overall_confidence"),
+        "full_results": results_dict
+    }
+    results_path = os.path.join(RESULTS_DIR, f"{job_id}.json")
+    with open(results_path, 'wb') as f:
+        f.write(orjson.dumps(response, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+
+    return results_dict
+
+
+async def process_video(store: JobStore, pool: ProcessPoolExecutor, job_id: str):
+    """Run analysis for one claimed job in the analysis process"""
+    job = await store.get(job_id)
+    if not job or "file_path" not in job:
+        # Deleted after it was queued
+        await store.release(job_id)
+        return
+
+    loop = asyncio.get_running_loop()
+
+    # Keep the claim alive while the analysis runs
+    heartbeat = asyncio.create_task(keep_alive(store, job_id))
+
+    try:
+        # Update status
+        await store.update(job_id, status="processing", progress=0.1)
+
+        results_dict = await loop.run_in_executor(pool, run_analysis, job_id, job["file_path"])
+
+        # Update job
+        await store.finish(
+            job_id,
+            "completed",
+            progress=1.0,
+            completed_at=datetime.utcnow().isoformat()
+        )
+
+        # Call webhook if configured
+        if job.get("webhook_url"):
+            schedule_webhook(store, job["webhook_url"], job_id, results_dict)
+
+        # Clean up video file (optional)
+        # os.remove(job["file_path"])
+
+    except Exception as e:
+        try:
+            await store.finish(
+                job_id,
+                "failed",
+                error=str(e),
+                completed_at=datetime.utcnow().isoformat()
+            )
+        finally:
+            # The analysis process died; let the caller replace the pool
+            # (even if recording the failure didn't work)
+            if isinstance(e, BrokenProcessPool):
+                raise
+
+    finally:
+        heartbeat.cancel()
+
+
+async def keep_alive(store: JobStore, job_id: str):
+    """Heartbeat a claimed job so it isn't requeued as stale"""
+    while True:
+        await asyncio.sleep(VISIBILITY_TIMEOUT / 3)
+        try:
+            await store.heartbeat(job_id)
+        except (redis.RedisError, OSError) as e:
+            # Try again next tick; one missed beat is well inside the timeout
+            print(f"Heartbeat for job {job_id} failed: {e}")
+
+
+def schedule_webhook(store: JobStore, url: str, job_id: str, results: dict):
+    """Deliver a webhook in the background while the worker claims its next job"""
+    task = asyncio.create_task(call_webhook(store, url, job_id, results))
+    webhook_tasks.add(task)
+    task.add_done_callback(webhook_tasks.discard)
+
+
+async def call_webhook(store: JobStore, url: str, job_id: str, results: dict):
+    """Call webhook URL with results, retrying transient failures"""
+    payload = orjson.dumps({
+        "job_id": job_id,
+        "status": "completed",
+        "avatar_stats": results.get("avatar_stats"),
+        "shot_breakdown": results.get("shot_breakdown"),
+        "confidence": results.get("overall_confidence")
+    }, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    error = None
+    for attempt in range(WEBHOOK_ATTEMPTS):
+        try:
+            async with WEBHOOK_SESSION.post(
+                url,
+                data=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=WEBHOOK_TIMEOUT
+            ) as resp:
+                resp.raise_for_status()
+            return
+        except aiohttp.ClientResponseError as e:
+            if e.status < 500 and e.status != 429:
+                # Rejected by the receiver; retrying won't change that
+                print(f"Webhook call rejected: {e}")
+                return
+            error = e
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+        except aiohttp.ClientError as e:
+            print(f"Webhook call failed: {e}")
+            return
+
+        if attempt < WEBHOOK_ATTEMPTS - 1:
+            await asyncio.sleep(2 ** attempt)
+
+    # Out of retries: keep it for a later redelivery pass
+    print(f"Webhook call failed after {WEBHOOK_ATTEMPTS} attempts: {error}")
+    try:
+        await store.dead_letter_webhook(url, job_id, payload, str(error))
+    except Exception as e:
+        print(f"Could not dead-letter webhook for job {job_id}: {e}")
+
+
+def create_analysis_pool() -> ProcessPoolExecutor:
+    """Single dedicated process for CPU-heavy analysis"""
+    # spawn: never fork a process that has an event loop and threads
+    return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def main():
+    global WEBHOOK_SESSION
+
+    store = JobStore.from_url()
+    WEBHOOK_SESSION = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=30)
+    )
+    pool = create_analysis_pool()
+    last_reclaim = 0.0
+
+    print(f"Worker started (visibility timeout {VISIBILITY_TIMEOUT}s)")
+
+    try:
+        while True:
+            try:
+                # Requeue jobs whose worker died mid-analysis
+                now = asyncio.get_running_loop().time()
+                if now - last_reclaim > RECLAIM_INTERVAL:
+                    reclaimed = await store.reclaim_stale()
+                    if reclaimed:
+                        print(f"Requeued {reclaimed} stale job(s)")
+                    last_reclaim = now
+
+                job_id = await store.claim(timeout=5)
+                if job_id:
+                    await process_video(store, pool, job_id)
+            except BrokenProcessPool:
+                print("Analysis process crashed; restarting it")
+                pool.shutdown(wait=False)
+                pool = create_analysis_pool()
+            except (redis.RedisError, OSError) as e:
+                # Redis restarting or unreachable: wait it out. A job claimed
+                # before the error is requeued by reclaim_stale().
+                print(f"Redis error, retrying in {REDIS_RETRY_DELAY}s: {e}")
+                await asyncio.sleep(REDIS_RETRY_DELAY)
+    finally:
+        pool.shutdown()
+        # Give in-flight webhooks a chance to finish before closing the session
+        if webhook_tasks:
+            await asyncio.wait(webhook_tasks, timeout=30)
+        await WEBHOOK_SESSION.close()
+        await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())